@@ -2,10 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.database.connection import get_db
-from app.schemas.user import UserCreate, UserUpdate, UserResponse
+from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserCountResponse
 from app.services.user_service import UserService
-from app.models.user import User
-from app.monitoring.metrics import PrometheusMetrics
 
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
 
@@ -14,14 +12,16 @@ def create_user(user_data: UserCreate, db: Session = Depends(get_db)):
     """Create a new user"""
     user_service = UserService(db)
     try:
-        user = user_service.create_user(user_data)
-        
-        # Update metrics
-        total_users = user_service.get_users_count()
-        active_users = db.query(User).filter(User.is_active == True).count()
-        PrometheusMetrics.update_user_metrics(total_users, active_users)
-        
-        return user
+        return user_service.create_user(user_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/bulk", response_model=List[UserResponse], status_code=status.HTTP_201_CREATED)
+def create_users_bulk(users_data: List[UserCreate], db: Session = Depends(get_db)):
+    """Create many users in a single transaction"""
+    user_service = UserService(db)
+    try:
+        return user_service.bulk_create(users_data, return_rows=True)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -31,6 +31,13 @@ def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     user_service = UserService(db)
     return user_service.get_users(skip=skip, limit=limit)
 
+# Declared before /{user_id} so "count" isn't parsed as an ID
+@router.get("/count", response_model=UserCountResponse)
+def get_users_count(approx: bool = False, db: Session = Depends(get_db)):
+    """Get the number of users; approx=true allows a planner estimate on PostgreSQL"""
+    user_service = UserService(db)
+    return UserCountResponse(count=user_service.get_users_count(approx=approx))
+
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(user_id: int, db: Session = Depends(get_db)):
     """Get user by ID"""
@@ -48,12 +55,6 @@ def update_user(user_id: int, user_data: UserUpdate, db: Session = Depends(get_d
         user = user_service.update_user(user_id, user_data)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        
-        # Update metrics
-        total_users = user_service.get_users_count()
-        active_users = db.query(User).filter(User.is_active == True).count()
-        PrometheusMetrics.update_user_metrics(total_users, active_users)
-        
         return user
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -64,9 +65,4 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     user_service = UserService(db)
     success = user_service.delete_user(user_id)
     if not success:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Update metrics
-    total_users = user_service.get_users_count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    PrometheusMetrics.update_user_metrics(total_users, active_users)
\ No newline at end of file
+        raise HTTPException(status_code=404, detail="User not found")
\ No newline at end of file
@@ -1,3 +1,4 @@
-from .client import ElasticsearchClient, es_client
+from .bulk import BulkProcessor
+from .client import ElasticsearchClient, OrjsonSerializer, es_client
 
-__all__ = ['ElasticsearchClient', 'es_client']
+__all__ = ['BulkProcessor', 'ElasticsearchClient', 'OrjsonSerializer', 'es_client']
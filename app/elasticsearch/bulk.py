@@ -0,0 +1,201 @@
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import orjson
+from elasticsearch import Elasticsearch, helpers
+from app.logging.logging import app_logger
+from app.monitoring.metrics import PrometheusMetrics
+
+class BulkProcessor:
+    def __init__(self, client: Elasticsearch, chunk_size: int = 500, flush_interval: float = 1.0,
+                 max_chunk_bytes: int = 50 * 1024 * 1024, thread_count: int = 4,
+                 queue_size: int = 4, max_queue_size: int = 10000,
+                 prepare: Optional[Callable[[], bool]] = None, retry_interval: float = 5.0):
+        """Buffer documents in memory and ship them to Elasticsearch via the _bulk API"""
+        self.client = client
+        # Run once (retried until it returns True) before anything is sent,
+        # e.g. to install the index template that maps the documents
+        self._prepare = prepare
+        self._prepared = prepare is None
+        self.retry_interval = retry_interval
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_chunk_bytes = max_chunk_bytes
+        self.thread_count = max(1, thread_count)
+        self.queue_size = queue_size
+        # Collect enough documents per flush to give every bulk thread a chunk
+        self.batch_size = self.chunk_size * self.thread_count
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        # Serialized {"index": {"_index": ...}} action line per index name
+        self._headers: Dict[str, bytes] = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # Set by stop(); later documents are only queued (and sent by the next
+        # flush or the atexit stop) instead of lazily starting a flusher
+        # thread nobody would join
+        self._stopped = False
+        # Drops are counted by es_log_dropped_total; the warning is only
+        # written once per interval with the number dropped since the last one
+        self.drop_warning_interval = 10.0
+        self._dropped_since_warning = 0
+        self._next_drop_warning = 0.0
+        # The flusher is a daemon thread; when the interpreter exits without
+        # going through the app shutdown hook, let it send the batch it holds
+        # and then drain the queue
+        atexit.register(self.stop)
+
+    def start(self):
+        """Start the background flusher thread"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="es-bulk-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the flusher thread and drain whatever is still queued"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopped = True
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def add(self, index_name: str, document: Dict[str, Any]) -> bool:
+        """Queue a document for indexing; never blocks the caller"""
+        if self._thread is None and not self._stopped:
+            self.start()
+        try:
+            self._queue.put_nowait((index_name, document))
+            return True
+        except queue.Full:
+            PrometheusMetrics.es_log_dropped()
+            self._warn_dropped()
+            return False
+
+    def _warn_dropped(self):
+        now = time.monotonic()
+        with self._lock:
+            self._dropped_since_warning += 1
+            if now < self._next_drop_warning:
+                return
+            dropped, self._dropped_since_warning = self._dropped_since_warning, 0
+            self._next_drop_warning = now + self.drop_warning_interval
+        app_logger.warning("Elasticsearch bulk queue full, dropping documents", dropped=dropped)
+
+    def flush(self):
+        """Send every queued document, including any batch the flusher thread holds, before returning"""
+        if not self._queue.unfinished_tasks:
+            return
+        if not self._ensure_prepared():
+            app_logger.error(
+                "Elasticsearch not ready, leaving documents queued",
+                count=self._queue.qsize()
+            )
+            return
+        while True:
+            actions = self._drain()
+            if actions:
+                self._send(actions)
+                continue
+            # The queue is empty; wait for the batch the flusher thread took
+            # to be sent (every sent document is marked task_done)
+            with self._queue.all_tasks_done:
+                if not self._queue.unfinished_tasks:
+                    break
+                self._queue.all_tasks_done.wait(self.flush_interval)
+
+    def _ensure_prepared(self) -> bool:
+        if not self._prepared:
+            self._prepared = bool(self._prepare())
+        return self._prepared
+
+    def _expand(self, item: Tuple[str, Dict[str, Any]]) -> Tuple[bytes, bytes]:
+        """Turn a queued document into pre-serialized bulk action and source lines"""
+        index_name, document = item
+        header = self._headers.get(index_name)
+        if header is None:
+            # Index names roll over daily; don't keep old days' headers forever
+            if len(self._headers) > 64:
+                self._headers.clear()
+            header = self._headers[index_name] = orjson.dumps({"index": {"_index": index_name}})
+        return header, orjson.dumps(document)
+
+    def _drain(self) -> List[Tuple[str, Dict[str, Any]]]:
+        actions = []
+        while len(actions) < self.batch_size:
+            try:
+                actions.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return actions
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._ensure_prepared():
+                # Documents stay queued until the cluster accepts the preparation step
+                self._stop.wait(self.retry_interval)
+                continue
+            try:
+                actions = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            # Keep collecting until the batch is full or the flush interval elapses
+            deadline = time.monotonic() + self.flush_interval
+            while len(actions) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    actions.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._send(actions)
+
+    def _send(self, actions: List[Tuple[str, Dict[str, Any]]]):
+        try:
+            if len(actions) <= self.chunk_size:
+                # A single chunk gains nothing from spinning up a thread pool
+                success, errors = helpers.bulk(
+                    self.client,
+                    actions,
+                    chunk_size=self.chunk_size,
+                    max_chunk_bytes=self.max_chunk_bytes,
+                    expand_action_callback=self._expand,
+                    raise_on_error=False
+                )
+                failed = len(errors)
+            else:
+                success = failed = 0
+                for ok, _ in helpers.parallel_bulk(
+                    self.client,
+                    actions,
+                    thread_count=self.thread_count,
+                    chunk_size=self.chunk_size,
+                    max_chunk_bytes=self.max_chunk_bytes,
+                    queue_size=self.queue_size,
+                    expand_action_callback=self._expand,
+                    raise_on_error=False
+                ):
+                    if ok:
+                        success += 1
+                    else:
+                        failed += 1
+            if failed:
+                app_logger.error("Bulk indexing partially failed", failed=failed, indexed=success)
+            else:
+                app_logger.debug("Documents indexed", count=success)
+        except Exception as e:
+            app_logger.error("Failed to bulk index documents", count=len(actions), error=str(e))
+        finally:
+            # Sent or given up on; lets flush() know the batch is done
+            for _ in actions:
+                self._queue.task_done()
@@ -1,19 +1,94 @@
-from elasticsearch import Elasticsearch
+import asyncio
+import os
+import time
+import orjson
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+from elasticsearch.serializer import JsonSerializer
 from typing import Dict, Any, List, Optional
 import json
-from datetime import datetime
 from app.logging.logging import app_logger
+from app.elasticsearch.bulk import BulkProcessor
+
+class OrjsonSerializer(JsonSerializer):
+    """JSON serializer backed by orjson instead of the stdlib json module"""
+
+    def dumps(self, data: Any) -> bytes:
+        # Pre-serialized bodies are forwarded untouched
+        if isinstance(data, str):
+            return data.encode("utf-8", "surrogatepass")
+        if isinstance(data, bytes):
+            return data
+        return orjson.dumps(data, default=self.default)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
 
 class ElasticsearchClient:
     def __init__(self, host: str = "localhost", port: int = 9200):
         """Initialize Elasticsearch client"""
-        self.client = Elasticsearch([f"http://{host}:{port}"])
+        hosts = [f"http://{host}:{port}"]
+        # The blocking client is only used by the bulk flusher thread and
+        # startup/admin calls; request handlers await the async client
+        # Log payloads repeat the same keys and values, so gzip request bodies
+        self.client = Elasticsearch(hosts, serializer=OrjsonSerializer(), http_compress=True)
+        self.async_client = AsyncElasticsearch(hosts, serializer=OrjsonSerializer(), http_compress=True)
         self.index_prefix = "user-mgt"
+        # With logging to Elasticsearch switched off, callers skip building documents
+        self.enabled = os.getenv("ELASTICSEARCH_ENABLED", "true").lower() in ("1", "true", "yes")
+        self._index_day = -1
+        # (healthy, expires_at) so probe storms share one cluster round-trip
+        self._health_cache = (False, 0.0)
+        self._health_ttl = 2.0
+        self._health_lock = asyncio.Lock()
+        self._index_names: Dict[str, str] = {}
+        self.bulk_processor = BulkProcessor(
+            self.client,
+            chunk_size=int(os.getenv("ES_BULK_CHUNK_SIZE", "500")),
+            thread_count=int(os.getenv("ES_BULK_THREAD_COUNT", str(os.cpu_count() or 4))),
+            queue_size=int(os.getenv("ES_BULK_QUEUE_SIZE", "4")),
+            max_chunk_bytes=int(os.getenv("ES_BULK_MAX_CHUNK_BYTES", str(50 * 1024 * 1024))),
+            # Without the template, dynamic mapping would type epoch-second
+            # timestamps as float for the rest of the day's indices
+            prepare=self.create_index_template
+        )
+
+    def start(self):
+        """Start background bulk indexing; it installs the index templates before its first send"""
+        if not self.enabled:
+            return
+        self.bulk_processor.start()
+
+    def flush(self):
+        """Send all queued log documents immediately"""
+        self.bulk_processor.flush()
+
+    def close(self):
+        """Drain queued log documents and close the connection pool"""
+        self.bulk_processor.stop()
+        self.client.close()
+
+    async def aclose(self):
+        """Close both the blocking and the async connection pools"""
+        self.close()
+        await self.async_client.close()
         
-    def health_check(self) -> bool:
-        """Check Elasticsearch cluster health"""
+    async def health_check(self) -> bool:
+        """Check Elasticsearch cluster health, reusing the result for a couple of seconds"""
+        healthy, expires_at = self._health_cache
+        if time.monotonic() < expires_at:
+            return healthy
+        async with self._health_lock:
+            # Another caller may have refreshed the result while we waited
+            healthy, expires_at = self._health_cache
+            if time.monotonic() < expires_at:
+                return healthy
+            healthy = await self._check_health()
+            self._health_cache = (healthy, time.monotonic() + self._health_ttl)
+        return healthy
+    
+    async def _check_health(self) -> bool:
         try:
-            health = self.client.cluster.health()
+            health = await self.async_client.cluster.health()
             return health['status'] in ['green', 'yellow']
         except Exception as e:
             app_logger.error("Elasticsearch health check failed", error=str(e))
@@ -34,10 +109,50 @@ class ElasticsearchClient:
             app_logger.error("Failed to create index", index=index_name, error=str(e))
             return False
     
-    def index_document(self, index_name: str, document: Dict[str, Any], doc_id: str = None) -> bool:
+    def create_index_template(self) -> bool:
+        """Map `timestamp` on all daily indices so epoch-second floats are parsed as dates"""
+        mappings = {
+            "properties": {
+                # Application logs shipped by Logstash still carry ISO timestamps
+                "timestamp": {"type": "date", "format": "strict_date_optional_time||epoch_second"}
+            }
+        }
+        try:
+            self.client.indices.put_index_template(
+                name=f"{self.index_prefix}-logs",
+                index_patterns=[f"{self.index_prefix}-*"],
+                priority=100,
+                template={"mappings": mappings}
+            )
+            # The user-action audit log is append-only and rarely searched live:
+            # refresh and fsync the translog less often to keep bulk ingest cheap.
+            # Templates don't merge, so this one repeats the shared mappings.
+            self.client.indices.put_index_template(
+                name=f"{self.index_prefix}-user-actions",
+                index_patterns=[f"{self.index_prefix}-user-actions-*"],
+                priority=200,
+                template={
+                    "settings": {
+                        "index": {
+                            "refresh_interval": os.getenv("ES_USER_ACTIONS_REFRESH_INTERVAL", "30s"),
+                            "translog": {
+                                "durability": os.getenv("ES_USER_ACTIONS_TRANSLOG_DURABILITY", "async"),
+                                "sync_interval": os.getenv("ES_USER_ACTIONS_TRANSLOG_SYNC_INTERVAL", "30s")
+                            }
+                        }
+                    },
+                    "mappings": mappings
+                }
+            )
+            return True
+        except Exception as e:
+            app_logger.error("Failed to create index template", error=str(e))
+            return False
+    
+    async def index_document(self, index_name: str, document: Dict[str, Any], doc_id: str = None) -> bool:
         """Index a document"""
         try:
-            result = self.client.index(
+            result = await self.async_client.index(
                 index=index_name,
                 body=document,
                 id=doc_id
@@ -48,10 +163,10 @@ class ElasticsearchClient:
             app_logger.error("Failed to index document", index=index_name, error=str(e))
             return False
     
-    def search_documents(self, index_name: str, query: Dict[str, Any], size: int = 10) -> List[Dict[str, Any]]:
+    async def search_documents(self, index_name: str, query: Dict[str, Any], size: int = 10) -> List[Dict[str, Any]]:
         """Search documents in an index"""
         try:
-            result = self.client.search(
+            result = await self.async_client.search(
                 index=index_name,
                 body=query,
                 size=size
@@ -61,12 +176,26 @@ class ElasticsearchClient:
             app_logger.error("Search failed", index=index_name, error=str(e))
             return []
     
+    def _daily_index(self, name: str) -> str:
+        """Return today's index name, rebuilding the cached names only when the UTC day changes"""
+        today = int(time.time()) // 86400
+        if today != self._index_day:
+            date_str = time.strftime('%Y.%m.%d', time.gmtime(today * 86400))
+            self._index_names = {
+                kind: f"{self.index_prefix}-{kind}-{date_str}"
+                for kind in ("user-actions", "api-requests", "errors")
+            }
+            self._index_day = today
+        return self._index_names[name]
+    
     def log_user_action(self, user_id: int, action: str, details: Dict[str, Any] = None):
         """Log user actions to Elasticsearch"""
-        index_name = f"{self.index_prefix}-user-actions-{datetime.now().strftime('%Y.%m.%d')}"
+        if not self.enabled:
+            return False
+        index_name = self._daily_index("user-actions")
         
         document = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": time.time(),
             "user_id": user_id,
             "action": action,
             "service": "user-mgt-api",
@@ -74,15 +203,17 @@ class ElasticsearchClient:
             "details": details or {}
         }
         
-        return self.index_document(index_name, document)
+        return self.bulk_processor.add(index_name, document)
     
     def log_api_request(self, method: str, endpoint: str, status_code: int, 
                        duration: float, user_id: int = None, ip_address: str = None):
         """Log API requests to Elasticsearch"""
-        index_name = f"{self.index_prefix}-api-requests-{datetime.now().strftime('%Y.%m.%d')}"
+        if not self.enabled:
+            return False
+        index_name = self._daily_index("api-requests")
         
         document = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": time.time(),
             "method": method,
             "endpoint": endpoint,
             "status_code": status_code,
@@ -93,15 +224,17 @@ class ElasticsearchClient:
             "environment": "development"
         }
         
-        return self.index_document(index_name, document)
+        return self.bulk_processor.add(index_name, document)
     
     def log_error(self, error_type: str, error_message: str, stack_trace: str = None, 
                   user_id: int = None, request_id: str = None):
         """Log errors to Elasticsearch"""
-        index_name = f"{self.index_prefix}-errors-{datetime.now().strftime('%Y.%m.%d')}"
+        if not self.enabled:
+            return False
+        index_name = self._daily_index("errors")
         
         document = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": time.time(),
             "error_type": error_type,
             "error_message": error_message,
             "stack_trace": stack_trace,
@@ -111,7 +244,7 @@ class ElasticsearchClient:
             "environment": "development"
         }
         
-        return self.index_document(index_name, document)
+        return self.bulk_processor.add(index_name, document)
 
 # Global Elasticsearch client instance
 es_client = ElasticsearchClient()
@@ -1,26 +1,36 @@
 import logging
 import logging.config
 import os
-import json
+import orjson
 import structlog
-from datetime import datetime
-from pythonjsonlogger import jsonlogger
 
 config_path = os.path.join(os.path.dirname(__file__), '..', 'logging.conf')
 logging.config.fileConfig(config_path, disable_existing_loggers=False)
 
+def _orjson_dumps(obj, **kwargs) -> str:
+    return orjson.dumps(obj, **kwargs).decode()
+
+def _add_service_context(logger, method_name, event_dict):
+    """Add the fields Logstash/Kibana expect on every application log line"""
+    event_dict['level'] = event_dict.get('level', method_name).upper()
+    event_dict.setdefault('service', 'user-mgt-api')
+    event_dict.setdefault('environment', 'development')
+    return event_dict
+
+# Processors that run on every log call; rendering happens once in the handler
+shared_processors = [
+    structlog.stdlib.add_logger_name,
+    structlog.stdlib.add_log_level,
+    structlog.processors.TimeStamper(fmt="iso", utc=True, key="timestamp"),
+]
+
 # Configure structlog for structured logging
 structlog.configure(
     processors=[
         structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
+        *shared_processors,
         structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
+        structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
     ],
     context_class=dict,
     logger_factory=structlog.stdlib.LoggerFactory(),
@@ -31,27 +41,26 @@ structlog.configure(
 # Create structured logger
 app_logger = structlog.get_logger('appLogger')
 
-# Create a custom JSON formatter for file logging
-class CustomJSONFormatter(jsonlogger.JsonFormatter):
-    def add_fields(self, log_record, record, message_dict):
-        super().add_fields(log_record, record, message_dict)
-        if not log_record.get('timestamp'):
-            now = datetime.utcnow().isoformat()
-            log_record['timestamp'] = now
-        if log_record.get('level'):
-            log_record['level'] = log_record['level'].upper()
-        else:
-            log_record['level'] = record.levelname
-        if not log_record.get('service'):
-            log_record['service'] = 'user-mgt-api'
-        if not log_record.get('environment'):
-            log_record['environment'] = 'development'
-
-# Configure file handler with JSON formatter
+# Single JSON rendering step shared by structlog and stdlib records;
+# exception info is only formatted when a call actually passes exc_info
+json_formatter = structlog.stdlib.ProcessorFormatter(
+    processors=[
+        structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+        structlog.processors.format_exc_info,
+        _add_service_context,
+        structlog.processors.EventRenamer('message'),
+        structlog.processors.JSONRenderer(serializer=_orjson_dumps),
+    ],
+    foreign_pre_chain=shared_processors,
+)
+
+# Configure file handler with JSON formatter; DEBUG lines are dropped
 file_handler = logging.FileHandler('app_events.log')
-file_handler.setFormatter(CustomJSONFormatter())
+file_handler.setFormatter(json_formatter)
+file_handler.setLevel(logging.INFO)
 
-# Get the app logger and add the JSON file handler
+# Get the app logger and add the JSON file handler. The INFO level lets
+# filter_by_level discard DEBUG calls before any processor runs.
 logger = logging.getLogger('appLogger')
 logger.addHandler(file_handler)
-logger.setLevel(logging.DEBUG)
+logger.setLevel(logging.INFO)
@@ -1,30 +1,31 @@
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from app.database.connection import engine, get_db
-from app.models.user import Base, User
+from app.database.connection import SessionLocal, init_db
 from app.api.user_routes import router as user_router
+from app.services.user_service import UserService
 from app.monitoring.metrics import PrometheusMetrics, CONTENT_TYPE_LATEST
+from app.monitoring.middleware import ObservabilityMiddleware
 from app.elasticsearch.client import es_client
 from app.logging.logging import app_logger
+import os
 import time
 import socket
 from opentelemetry import trace
 from opentelemetry.sdk.resources import SERVICE_NAME, Resource
 from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title="User Management API",
     description="A modular Python application for user CRUD operations with Prometheus monitoring",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -36,76 +37,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Middleware for metrics collection and ELK logging
-@app.middleware("http")
-async def metrics_middleware(request: Request, call_next):
-    start_time = time.time()
-    client_ip = request.client.host if request.client else "unknown"
-    
-    # Log request start
-    app_logger.info(
-        "Request started",
-        method=request.method,
-        endpoint=request.url.path,
-        client_ip=client_ip,
-        user_agent=request.headers.get("user-agent", "unknown")
-    )
-    
-    try:
-        response = await call_next(request)
-        
-        # Record metrics
-        duration = time.time() - start_time
-        PrometheusMetrics.record_request(
-            method=request.method,
-            endpoint=request.url.path,
-            status=response.status_code,
-            duration=duration
-        )
-        
-        # Log to Elasticsearch
-        es_client.log_api_request(
-            method=request.method,
-            endpoint=request.url.path,
-            status_code=response.status_code,
-            duration=duration,
-            ip_address=client_ip
-        )
-        
-        # Log response
-        app_logger.info(
-            "Request completed",
-            method=request.method,
-            endpoint=request.url.path,
-            status_code=response.status_code,
-            duration_ms=duration * 1000,
-            client_ip=client_ip
-        )
-        
-        return response
-        
-    except Exception as e:
-        duration = time.time() - start_time
-        
-        # Log error to Elasticsearch
-        es_client.log_error(
-            error_type=type(e).__name__,
-            error_message=str(e),
-            request_id=getattr(request.state, 'request_id', None)
-        )
-        
-        # Log error
-        app_logger.error(
-            "Request failed",
-            method=request.method,
-            endpoint=request.url.path,
-            error=str(e),
-            duration_ms=duration * 1000,
-            client_ip=client_ip,
-            exc_info=True
+# Metrics collection and ELK logging
+app.add_middleware(ObservabilityMiddleware)
+
+@app.on_event("startup")
+def startup_event():
+    """Create missing tables, seed user gauges and start the Elasticsearch bulk indexer"""
+    init_db()
+    # Count once per process; write paths keep the gauges current afterwards
+    with SessionLocal() as db:
+        user_service = UserService(db)
+        PrometheusMetrics.update_user_metrics(
+            user_service.get_users_count(),
+            user_service.get_active_users_count()
         )
-        
-        raise
+    es_client.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued Elasticsearch documents before exiting"""
+    await es_client.aclose()
 
 # Include routers
 app.include_router(user_router)
@@ -123,9 +74,16 @@ def root():
     }
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint including Elasticsearch status"""
-    elasticsearch_healthy = es_client.health_check()
+    if not es_client.enabled:
+        return {
+            "status": "healthy",
+            "elasticsearch": "disabled",
+            "timestamp": time.time()
+        }
+    
+    elasticsearch_healthy = await es_client.health_check()
     
     health_status = {
         "status": "healthy" if elasticsearch_healthy else "degraded",
@@ -141,13 +99,7 @@ def health_check():
 @app.get("/metrics")
 def get_metrics():
     """Prometheus metrics endpoint"""
-    # Update user metrics before serving
-    db = next(get_db())
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    PrometheusMetrics.update_user_metrics(total_users, active_users)
     PrometheusMetrics.update_system_metrics()
-    db.close()
     
     return Response(
         content=PrometheusMetrics.get_metrics(),
@@ -157,7 +109,10 @@ def get_metrics():
 # OpenTelemetry Tracing Setup
 trace.set_tracer_provider(
     TracerProvider(
-        resource=Resource.create({SERVICE_NAME: "user-mgt-pj"})
+        resource=Resource.create({SERVICE_NAME: "user-mgt-pj"}),
+        # Keep a fraction of new traces (5% by default); child spans follow
+        # their parent's decision
+        sampler=ParentBased(TraceIdRatioBased(float(os.getenv("OTEL_SAMPLE_RATIO", "0.05"))))
     )
 )
 
@@ -166,11 +121,16 @@ otlp_exporter = OTLPSpanExporter(
     insecure=True
 )
 
-span_processor = BatchSpanProcessor(otlp_exporter)
+span_processor = BatchSpanProcessor(
+    otlp_exporter,
+    max_queue_size=4096,
+    max_export_batch_size=512,
+    schedule_delay_millis=2000
+)
 trace.get_tracer_provider().add_span_processor(span_processor)
 
-# Instrument FastAPI
-FastAPIInstrumentor.instrument_app(app)
+# Instrument FastAPI; scrape and probe endpoints are too frequent to trace
+FastAPIInstrumentor.instrument_app(app, excluded_urls="/metrics,/health")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,12 +1,20 @@
 
-from sqlalchemy import String, DateTime, Boolean, func
+from sqlalchemy import String, DateTime, Boolean, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 from app.database.connection import Base
 import datetime
+from typing import Optional
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Serves active-user counts/filters and keyset pagination over active users
+        Index("ix_users_active_id", "is_active", "id"),
+    )
+    # Fetch server-generated created_at/updated_at with RETURNING as part of
+    # the INSERT/UPDATE instead of a follow-up SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     username: Mapped[str] = mapped_column(String(50), unique=True, index=True, nullable=False)
@@ -14,4 +22,4 @@ class User(Base):
     full_name: Mapped[str] = mapped_column(String(100), nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
-    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), onupdate=func.now())
+    updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(timezone=True), onupdate=func.now())
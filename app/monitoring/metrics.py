@@ -1,4 +1,5 @@
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+import functools
 import time
 import psutil
 
@@ -36,12 +37,33 @@ MEMORY_USAGE = Gauge(
     'Current memory usage in bytes'
 )
 
+# Documents the Elasticsearch bulk queue had to discard
+ES_LOG_DROPPED = Counter(
+    'es_log_dropped_total',
+    'Log documents dropped because the Elasticsearch bulk queue was full'
+)
+
+# Reuse one Process handle across scrapes and prime the CPU counter so the
+# first non-blocking cpu_percent() call returns a real value
+_PROC = psutil.Process()
+_PROC.cpu_percent(interval=None)
+
+# labels() hashes the label values and takes the metric lock on every call;
+# the set of (method, route, status) combinations is small, so keep the children
+@functools.lru_cache(maxsize=512)
+def _request_count(method: str, endpoint: str, status: int):
+    return REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status)
+
+@functools.lru_cache(maxsize=512)
+def _request_duration(method: str, endpoint: str):
+    return REQUEST_DURATION.labels(method=method, endpoint=endpoint)
+
 class PrometheusMetrics:
     @staticmethod
     def record_request(method: str, endpoint: str, status: int, duration: float):
-        """Record HTTP request metrics"""
-        REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status).inc()
-        REQUEST_DURATION.labels(method=method, endpoint=endpoint).observe(duration)
+        """Record HTTP request metrics; `endpoint` should be the route template"""
+        _request_count(method, endpoint, status).inc()
+        _request_duration(method, endpoint).observe(duration)
 
     @staticmethod
     def update_user_metrics(total_users: int, active_users: int):
@@ -49,11 +71,48 @@ class PrometheusMetrics:
         TOTAL_USERS.set(total_users)
         ACTIVE_USERS.set(active_users)
 
+    @staticmethod
+    def user_created(active: bool):
+        """Account for a newly created user without recounting the table"""
+        TOTAL_USERS.inc()
+        if active:
+            ACTIVE_USERS.inc()
+
+    @staticmethod
+    def users_created(total: int, active: int):
+        """Account for a batch of newly created users"""
+        TOTAL_USERS.inc(total)
+        ACTIVE_USERS.inc(active)
+
+    @staticmethod
+    def user_deleted(active: bool):
+        """Account for a deleted user without recounting the table"""
+        TOTAL_USERS.dec()
+        if active:
+            ACTIVE_USERS.dec()
+
+    @staticmethod
+    def users_deleted(total: int, active: int):
+        """Account for a batch of deleted users"""
+        TOTAL_USERS.dec(total)
+        ACTIVE_USERS.dec(active)
+
+    @staticmethod
+    def user_activity_changed(delta: int):
+        """Adjust the active user gauge by +1/-1 when a user is (de)activated"""
+        if delta:
+            ACTIVE_USERS.inc(delta)
+
+    @staticmethod
+    def es_log_dropped():
+        """Count a log document dropped on a full Elasticsearch bulk queue"""
+        ES_LOG_DROPPED.inc()
+
     @staticmethod
     def update_system_metrics():
         """Update system-related metrics"""
-        CPU_USAGE.set(psutil.cpu_percent())
-        MEMORY_USAGE.set(psutil.Process().memory_info().rss)
+        CPU_USAGE.set(_PROC.cpu_percent(interval=None))
+        MEMORY_USAGE.set(_PROC.memory_info().rss)
 
     @staticmethod
     def get_metrics():
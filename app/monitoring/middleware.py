@@ -0,0 +1,102 @@
+import time
+from starlette.background import BackgroundTask, BackgroundTasks
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import Response
+from app.monitoring.metrics import PrometheusMetrics
+from app.elasticsearch.client import es_client
+from app.logging.logging import app_logger
+
+def _observe_request(method: str, endpoint: str, status_code: int, duration: float,
+                     client_ip: str, user_agent: str):
+    """Ship request logs once the response has been delivered"""
+    es_client.log_api_request(
+        method=method,
+        endpoint=endpoint,
+        status_code=status_code,
+        duration=duration,
+        ip_address=client_ip
+    )
+
+    app_logger.info(
+        "Request completed",
+        method=method,
+        endpoint=endpoint,
+        status_code=status_code,
+        duration_ms=duration * 1000,
+        client_ip=client_ip,
+        user_agent=user_agent
+    )
+
+def _route_path(request: Request) -> str:
+    """Route template of the matched route, or "unmatched" when nothing matched"""
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    # Plain Starlette routes (/docs, /openapi.json) only record their endpoint
+    endpoint = request.scope.get("endpoint")
+    if endpoint is not None:
+        for candidate in request.app.router.routes:
+            if getattr(candidate, "endpoint", None) is endpoint:
+                return candidate.path
+    return "unmatched"
+
+class ObservabilityMiddleware(BaseHTTPMiddleware):
+    """Prometheus metrics, Elasticsearch request logs and the request log line in one pass"""
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        start_time = time.time()
+        client_ip = request.client.host if request.client else "unknown"
+
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            duration = time.time() - start_time
+
+            # Log error to Elasticsearch
+            es_client.log_error(
+                error_type=type(e).__name__,
+                error_message=str(e),
+                request_id=getattr(request.state, 'request_id', None)
+            )
+
+            # Log error
+            app_logger.error(
+                "Request failed",
+                method=request.method,
+                endpoint=request.url.path,
+                error=str(e),
+                duration_ms=duration * 1000,
+                client_ip=client_ip,
+                exc_info=True
+            )
+
+            raise
+
+        # Record metrics
+        duration = time.time() - start_time
+        # Label by route template (/api/v1/users/{user_id}) so per-ID paths
+        # don't create a new time series each
+        PrometheusMetrics.record_request(
+            method=request.method,
+            endpoint=_route_path(request),
+            status=response.status_code,
+            duration=duration
+        )
+
+        # Log to Elasticsearch and the log file after the response is sent
+        observe = BackgroundTask(
+            _observe_request,
+            method=request.method,
+            endpoint=request.url.path,
+            status_code=response.status_code,
+            duration=duration,
+            client_ip=client_ip,
+            user_agent=request.headers.get("user-agent", "unknown")
+        )
+        if response.background is None:
+            response.background = observe
+        else:
+            response.background = BackgroundTasks([response.background, observe])
+
+        return response
@@ -0,0 +1,22 @@
+import functools
+from typing import Callable
+from opentelemetry import trace
+
+def traced(name: str) -> Callable:
+    """Wrap a function in a span, but only inside a sampled (recording) trace"""
+    def decorator(func: Callable) -> Callable:
+        # Resolved once per function; a proxy until main.py installs the TracerProvider
+        tracer = trace.get_tracer(func.__module__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # With a ParentBased sampler an unsampled parent means a dropped
+            # child, so don't build the span at all
+            if not trace.get_current_span().is_recording():
+                return func(*args, **kwargs)
+            # The wrapped code opens no child spans, so the span isn't made
+            # current; it still ends (and records errors) on exit
+            with tracer.start_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,67 +1,277 @@
-from sqlalchemy.orm import Session
+import csv
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import Row, delete, exists, func, insert, or_, select, text, update
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.exc import IntegrityError
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from typing import List, Optional
-from opentelemetry import trace
+from typing import Any, Dict, List, Optional, Tuple, Union
 from app.logging.logging import app_logger
 from app.elasticsearch.client import es_client
+from app.monitoring.metrics import PrometheusMetrics
+from app.monitoring.tracing import traced
+
+# Bound once so every line from this module carries its component
+_log = app_logger.bind(component="user_service")
+
+# Total user count shared by all sessions for a few seconds so polling
+# clients don't each scan the table; writes that change it drop the entry
+_COUNT_TTL = 5.0
+_count_cache: Optional[Tuple[float, int]] = None
+_count_lock = threading.Lock()
+
+# Probe the unique indexes before writing so common duplicates fail without an
+# aborted INSERT/UPDATE; the constraints still catch races
+_PRECHECK_UNIQUE = os.getenv("USER_PRECHECK_UNIQUE", "false").lower() in ("1", "true", "yes")
+
+# Columns copied into Elasticsearch user-action documents
+_LOGGED_COLS = ("username", "email", "full_name", "is_active")
+
+def _snapshot(user) -> Dict[str, Any]:
+    """Logged column values of a User (or a RETURNING row)"""
+    return {col: getattr(user, col) for col in _LOGGED_COLS}
+
+def _compile_apply_update():
+    """Generate a straight-line assignment function for the UserUpdate fields"""
+    lines = ["def apply_update(user, data):"]
+    for field in UserUpdate.model_fields:
+        lines.append(f"    if {field!r} in data: user.{field} = data[{field!r}]")
+    namespace: Dict[str, Any] = {}
+    exec(compile("\n".join(lines), "<apply_update>", "exec"), namespace)
+    return namespace["apply_update"]
+
+# Built once at import; only the schema's fields can ever be assigned
+_APPLY_UPDATE = _compile_apply_update()
+
+def _emit(message: str, user_id: int, action: str, details: Dict[str, Any], **log_fields):
+    """Send one user-action event to the app log and Elasticsearch.
+
+    The app log gets only log_fields; the full details (values, emails) go to Elasticsearch.
+    """
+    if _log.isEnabledFor(logging.INFO):
+        _log.info(message, user_id=user_id, action=action, **log_fields)
+    es_client.log_user_action(user_id=user_id, action=action, details=details)
+
+def _invalidate_users_count():
+    global _count_cache
+    with _count_lock:
+        _count_cache = None
+
+class _UserCache:
+    """Small TTL + LRU map of username -> column values shared across sessions"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 2.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl:
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return entry[1]
+
+    def put(self, username: str, values: Dict[str, Any]):
+        with self._lock:
+            self._entries[username] = (time.monotonic(), values)
+            self._entries.move_to_end(username)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, *usernames: str):
+        with self._lock:
+            for username in usernames:
+                self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Repeat username lookups within a request chain skip the SELECT; entries are
+# dropped on update/delete here, other processes may see them for up to the TTL
+_user_cache = _UserCache()
 
 class UserService:
     def __init__(self, db: Session):
         self.db = db
 
+    @traced("UserService.create_user")
     def create_user(self, user_data: UserCreate) -> User:
         """Create a new user"""
-        tracer = trace.get_tracer(__name__)
-        with tracer.start_as_current_span("UserService.create_user"):
-            db_user = User(**user_data.dict())
-            try:
-                self.db.add(db_user)
-                self.db.commit()
-                self.db.refresh(db_user)
-                
-                # Log user creation
-                app_logger.info(
-                    "User created",
-                    user_id=db_user.id,
-                    username=db_user.username,
-                    email=db_user.email
-                )
-                
-                # Log to Elasticsearch
+        # updated_at is set explicitly so eager_defaults has nothing left to
+        # SELECT back after the INSERT
+        db_user = User(**user_data.model_dump(), updated_at=None)
+        try:
+            if _PRECHECK_UNIQUE and self._is_taken(user_data.username, user_data.email):
+                raise IntegrityError("duplicate username or email", None, None)
+            self.db.add(db_user)
+            self.db.commit()
+            
+            _invalidate_users_count()
+            PrometheusMetrics.user_created(db_user.is_active)
+            
+            # Log user creation to the app log and Elasticsearch
+            _emit(
+                "User created", db_user.id, "user_created", _snapshot(db_user),
+                username=db_user.username, email=db_user.email
+            )
+            
+            return db_user
+        except IntegrityError:
+            self.db.rollback()
+            _log.error(
+                "User creation failed - duplicate username or email",
+                username=user_data.username,
+                email=user_data.email
+            )
+            raise ValueError("username or email already exists")
+
+    def bulk_create(self, users: List[UserCreate], return_rows: bool = False) -> Union[int, List[Row]]:
+        """Insert many users in one transaction.
+
+        Returns how many were created, or with return_rows the created rows, in
+        request order, from a multi-row INSERT ... RETURNING. Without return_rows
+        PostgreSQL with psycopg2 uses COPY.
+        """
+        if not users:
+            return [] if return_rows else 0
+        
+        rows = [user_data.model_dump() for user_data in users]
+        created: List[Row] = []
+        try:
+            dialect = self.db.get_bind().dialect
+            if return_rows:
+                # Plain rows rather than ORM instances: nothing to expire on commit
+                # and no identity-map bookkeeping per user
+                created = self.db.execute(
+                    insert(User).returning(
+                        User.id, User.username, User.email, User.full_name,
+                        User.is_active, User.created_at, User.updated_at,
+                        # Rows come back in the order of the request body
+                        sort_by_parameter_order=True
+                    ),
+                    rows
+                ).all()
+            # copy_expert is psycopg2's API; psycopg 3 and pg8000 take the insert path
+            elif dialect.name == "postgresql" and dialect.driver == "psycopg2":
+                self._copy_users(rows)
+            else:
+                # Core executemany; batched by the engine's insertmanyvalues settings
+                self.db.execute(insert(User), rows)
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            _log.error(
+                "Bulk user creation failed - duplicate username or email",
+                count=len(rows)
+            )
+            raise ValueError("username or email already exists")
+        
+        _invalidate_users_count()
+        PrometheusMetrics.users_created(len(rows), sum(1 for row in rows if row["is_active"]))
+        
+        _log.info(
+            "Users bulk created",
+            count=len(rows),
+            usernames=[row["username"] for row in rows]
+        )
+        
+        # Queued only after the commit; shipped to Elasticsearch in bulk
+        if es_client.enabled:
+            for user in created:
                 es_client.log_user_action(
-                    user_id=db_user.id,
+                    user_id=user.id,
                     action="user_created",
-                    details={
-                        "username": db_user.username,
-                        "email": db_user.email,
-                        "full_name": db_user.full_name,
-                        "is_active": db_user.is_active
-                    }
-                )
-                
-                return db_user
-            except IntegrityError:
-                self.db.rollback()
-                app_logger.error(
-                    "User creation failed - duplicate username or email",
-                    username=user_data.username,
-                    email=user_data.email
+                    details=_snapshot(user)
                 )
-                raise ValueError("username or email already exists")
+            if not return_rows:
+                # COPY and executemany don't hand back ids; record the
+                # imported values so the import is still audited
+                for row in rows:
+                    es_client.log_user_action(
+                        user_id=None,
+                        action="user_created",
+                        details={col: row[col] for col in _LOGGED_COLS}
+                    )
+        
+        return created if return_rows else len(rows)
+
+    def _copy_users(self, rows: List[dict]):
+        """Stream rows into PostgreSQL with COPY instead of one INSERT per row (psycopg2 only)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow((row["username"], row["email"], row["full_name"], row["is_active"]))
+        buffer.seek(0)
+        
+        dbapi_connection = self.db.connection().connection
+        statement = (
+            f"COPY {User.__tablename__} (username, email, full_name, is_active) "
+            # csv.writer leaves empty strings unquoted, which COPY would read as NULL
+            "FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (full_name))"
+        )
+        try:
+            with dbapi_connection.cursor() as cursor:
+                cursor.copy_expert(statement, buffer)
+        except self.db.get_bind().dialect.dbapi.IntegrityError as e:
+            raise IntegrityError(statement, None, e)
+
+    def _is_taken(self, username: Optional[str], email: Optional[str],
+                  exclude_id: Optional[int] = None) -> bool:
+        """Check the username/email unique indexes with a single EXISTS probe"""
+        conditions = []
+        if username is not None:
+            conditions.append(User.username == username)
+        if email is not None:
+            conditions.append(User.email == email)
+        if not conditions:
+            return False
+        
+        query = select(User.id).where(or_(*conditions))
+        if exclude_id is not None:
+            query = query.where(User.id != exclude_id)
+        return self.db.scalar(select(exists(query)))
 
     def get_user(self, user_id: int) -> Optional[User]:
         """Get user by ID"""
-        return self.db.query(User).filter(User.id == user_id).first()
+        return self.db.get(User, user_id)
     
     def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
-        return self.db.query(User).filter(User.username == username).first()
+        values = _user_cache.get(username)
+        if values is not None:
+            # The session's own instance wins: it may hold pending edits or
+            # fresher state than the cache, which merge() would overwrite
+            loaded = self.db.identity_map.get(identity_key(User, values["id"]))
+            if loaded is not None:
+                return loaded
+            cached = User(**values)
+            make_transient_to_detached(cached)
+            # Attach without a SELECT
+            return self.db.merge(cached, load=False)
+        
+        user = self.db.scalar(select(User).where(User.username == username).limit(1))
+        if user is not None:
+            _user_cache.put(username, {
+                attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs
+            })
+        return user
     
     def get_users(self, skip: int = 0, limit: int = 100) -> List[User]:
         """Get list of users with pagination"""
-        return self.db.query(User).offset(skip).limit(limit).all()
+        return self.db.scalars(select(User).offset(skip).limit(limit)).all()
     
     def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
         """Update user by ID"""
@@ -69,82 +279,176 @@ class UserService:
         if not db_user:
             return None
         
+        was_active, original_username = db_user.is_active, db_user.username
+        update_data = user_data.model_dump(exclude_unset=True)
+        details: Dict[str, Any] = {"updated_data": update_data}
         # Store original values for logging
-        original_data = {
-            "username": db_user.username,
-            "email": db_user.email,
-            "full_name": db_user.full_name,
-            "is_active": db_user.is_active
-        }
+        if es_client.enabled:
+            details["original_data"] = _snapshot(db_user)
         
-        update_data = user_data.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_user, field, value)
+        _APPLY_UPDATE(db_user, update_data)
 
         try:
+            if _PRECHECK_UNIQUE and self._is_taken(
+                update_data.get("username"), update_data.get("email"), exclude_id=user_id
+            ):
+                raise IntegrityError("duplicate username or email", None, None)
             self.db.commit()
-            self.db.refresh(db_user)
+            _user_cache.discard(original_username, db_user.username)
             
-            # Log user update
-            app_logger.info(
-                "User updated",
-                user_id=user_id,
-                updated_fields=list(update_data.keys())
-            )
+            PrometheusMetrics.user_activity_changed(int(db_user.is_active) - int(was_active))
             
-            # Log to Elasticsearch
-            es_client.log_user_action(
-                user_id=user_id,
-                action="user_updated",
-                details={
-                    "original_data": original_data,
-                    "updated_data": update_data
-                }
+            # Log user update to the app log and Elasticsearch
+            _emit(
+                "User updated", user_id, "user_updated", details,
+                updated_fields=list(update_data.keys())
             )
             
             return db_user
         except IntegrityError:
             self.db.rollback()
-            app_logger.error(
+            _log.error(
                 "User update failed - duplicate username or email",
                 user_id=user_id,
                 update_data=update_data
             )
             raise ValueError("Username or email already exists")
+    
+    def update_users_bulk(self, user_ids: List[int], user_data: UserUpdate) -> int:
+        """Apply the same changes to many users with one UPDATE; returns the number updated"""
+        update_data = user_data.model_dump(exclude_unset=True)
+        if not user_ids or not update_data:
+            return 0
+        
+        try:
+            activity_delta = 0
+            if "is_active" in update_data:
+                # Only rows whose flag actually flips move the active gauge
+                flipped = self.db.scalar(
+                    select(func.count())
+                    .select_from(User)
+                    .where(User.id.in_(user_ids), User.is_active != update_data["is_active"])
+                )
+                activity_delta = flipped if update_data["is_active"] else -flipped
+            
+            updated_ids = self.db.scalars(
+                update(User)
+                .where(User.id.in_(user_ids))
+                .values(**update_data)
+                .returning(User.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            self.db.commit()
+            _user_cache.clear()
+        except IntegrityError:
+            self.db.rollback()
+            _log.error(
+                "Bulk user update failed - duplicate username or email",
+                user_ids=user_ids,
+                update_data=update_data
+            )
+            raise ValueError("Username or email already exists")
+        
+        PrometheusMetrics.user_activity_changed(activity_delta)
+        
+        if _log.isEnabledFor(logging.INFO):
+            _log.info(
+                "Users bulk updated",
+                count=len(updated_ids),
+                updated_fields=list(update_data.keys())
+            )
+        
+        # Queued only after the commit; shipped to Elasticsearch in bulk
+        if es_client.enabled:
+            for user_id in updated_ids:
+                es_client.log_user_action(
+                    user_id=user_id,
+                    action="user_updated",
+                    details={"updated_data": update_data}
+                )
+        
+        return len(updated_ids)
         
     def delete_user(self, user_id: int) -> bool:
         """Delete user by ID"""
-        db_user = self.get_user(user_id)
-        if not db_user:
+        # Delete and capture the row for logging in a single statement
+        deleted = self.db.execute(
+            delete(User)
+            .where(User.id == user_id)
+            .returning(User.username, User.email, User.full_name, User.is_active)
+        ).first()
+        if deleted is None:
+            self.db.rollback()
             return False
-        
-        # Store user data for logging before deletion
-        user_data = {
-            "username": db_user.username,
-            "email": db_user.email,
-            "full_name": db_user.full_name,
-            "is_active": db_user.is_active
-        }
-        
-        self.db.delete(db_user)
         self.db.commit()
+        _user_cache.discard(deleted.username)
         
-        # Log user deletion
-        app_logger.info(
-            "User deleted",
-            user_id=user_id,
-            username=user_data["username"]
-        )
+        _invalidate_users_count()
+        PrometheusMetrics.user_deleted(deleted.is_active)
         
-        # Log to Elasticsearch
-        es_client.log_user_action(
-            user_id=user_id,
-            action="user_deleted",
-            details=user_data
+        # Log user deletion to the app log and Elasticsearch
+        _emit(
+            "User deleted", user_id, "user_deleted", deleted._asdict(),
+            username=deleted.username
         )
         
         return True
     
-    def get_users_count(self) -> int:
-        """Get total count of users"""
-        return self.db.query(User).count()
+    def delete_users_bulk(self, user_ids: List[int]) -> int:
+        """Delete many users with one DELETE; returns the number deleted"""
+        if not user_ids:
+            return 0
+        
+        deleted = self.db.execute(
+            delete(User)
+            .where(User.id.in_(user_ids))
+            .returning(User.id, User.username, User.email, User.full_name, User.is_active)
+            .execution_options(synchronize_session=False)
+        ).all()
+        self.db.commit()
+        _user_cache.discard(*(user.username for user in deleted))
+        
+        _invalidate_users_count()
+        PrometheusMetrics.users_deleted(len(deleted), sum(1 for user in deleted if user.is_active))
+        
+        _log.info("Users bulk deleted", count=len(deleted))
+        
+        # Queued only after the commit; shipped to Elasticsearch in bulk
+        if es_client.enabled:
+            for user in deleted:
+                user_data = user._asdict()
+                es_client.log_user_action(
+                    user_id=user_data.pop("id"),
+                    action="user_deleted",
+                    details=user_data
+                )
+        
+        return len(deleted)
+    
+    def get_users_count(self, approx: bool = False) -> int:
+        """Get total count of users, cached for a few seconds"""
+        if approx and self.db.get_bind().dialect.name == "postgresql":
+            # Planner statistics: O(1) but only as fresh as the last ANALYZE/VACUUM
+            estimate = self.db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+                {"table": User.__tablename__}
+            ).scalar()
+            # -1 until the table has been analyzed once
+            if estimate is not None and estimate >= 0:
+                return estimate
+        
+        global _count_cache
+        cached = _count_cache
+        if cached is not None and time.monotonic() - cached[0] < _COUNT_TTL:
+            return cached[1]
+        
+        count = self.db.execute(select(func.count()).select_from(User)).scalar()
+        with _count_lock:
+            _count_cache = (time.monotonic(), count)
+        return count
+    
+    def get_active_users_count(self) -> int:
+        """Get count of active users"""
+        return self.db.execute(
+            select(func.count()).select_from(User).where(User.is_active == True)
+        ).scalar()
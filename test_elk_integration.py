@@ -4,17 +4,26 @@ Test script for ELK stack integration
 This script tests the Elasticsearch client and logging functionality
 """
 
+import asyncio
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 import json
 import time
 from app.elasticsearch.client import es_client
 from app.logging.logging import app_logger
 
+async def _health_check():
+    try:
+        return await es_client.health_check()
+    finally:
+        await es_client.async_client.close()
+
 def test_elasticsearch_connection():
     """Test Elasticsearch connection"""
     print("🔍 Testing Elasticsearch connection...")
     
-    if es_client.health_check():
+    if asyncio.run(_health_check()):
         print("✅ Elasticsearch is healthy!")
         return True
     else:
@@ -36,6 +45,9 @@ def test_elasticsearch_logging():
     """Test Elasticsearch logging"""
     print("📊 Testing Elasticsearch logging...")
     
+    # Map epoch-second timestamps as dates before the first documents create today's indices
+    es_client.create_index_template()
+    
     # Test API request logging
     es_client.log_api_request(
         method="GET",
@@ -59,6 +71,9 @@ def test_elasticsearch_logging():
         user_id=999
     )
     
+    # Documents are batched in the background; push them out now
+    es_client.flush()
+    
     print("✅ Elasticsearch logging test completed!")
 
 def test_api_endpoints():
@@ -66,26 +81,30 @@ def test_api_endpoints():
     print("🌐 Testing API endpoints...")
     
     base_url = "http://localhost:8000"
+    checks = {"/health": "Health", "/": "Root"}
+    
+    # One keep-alive session for every check; the checks are independent so run them together
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
     
     try:
-        # Test health endpoint
-        response = requests.get(f"{base_url}/health")
-        if response.status_code == 200:
-            print("✅ Health endpoint working!")
-            print(f"   Response: {response.json()}")
-        else:
-            print(f"❌ Health endpoint failed: {response.status_code}")
-        
-        # Test root endpoint
-        response = requests.get(f"{base_url}/")
-        if response.status_code == 200:
-            print("✅ Root endpoint working!")
-        else:
-            print(f"❌ Root endpoint failed: {response.status_code}")
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = {executor.submit(session.get, f"{base_url}{path}"): path for path in checks}
+            for future in as_completed(futures):
+                path = futures[future]
+                response = future.result()
+                if response.status_code == 200:
+                    print(f"✅ {checks[path]} endpoint working!")
+                    if path == "/health":
+                        print(f"   Response: {response.json()}")
+                else:
+                    print(f"❌ {checks[path]} endpoint failed: {response.status_code}")
             
     except requests.exceptions.ConnectionError:
         print("❌ API server is not running. Please start it with: python run.py")
         return False
+    finally:
+        session.close()
     
     return True
 
@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class _StubElasticsearch(BaseHTTPRequestHandler):
+    """Accepts index templates and _bulk requests, recording the indexed documents"""
+
+    def _reply(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if not self.path.startswith("/_bulk"):
+            return self._reply({"acknowledged": True})
+        lines = [json.loads(line) for line in body.splitlines() if line]
+        sources = lines[1::2]
+        self.server.documents.extend(sources)
+        self._reply({
+            "took": 1,
+            "errors": False,
+            "items": [{"index": {"status": 201}} for _ in sources]
+        })
+
+    do_POST = do_PUT
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_es():
+    server = HTTPServer(("127.0.0.1", 0), _StubElasticsearch)
+    server.documents = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _run_script(script, stub_es, tmp_path):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, ELASTICSEARCH_ENABLED="true")
+    subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script).format(port=stub_es.server_port)],
+        cwd=tmp_path, env=env, check=True, timeout=60
+    )
+
+def test_documents_logged_before_exit_are_sent(stub_es, tmp_path):
+    # Same sequence as test_elk_integration.test_elasticsearch_logging, then exit
+    # while the flusher thread may still be holding the batch
+    _run_script("""
+        from app.elasticsearch.client import ElasticsearchClient
+        client = ElasticsearchClient(port={port})
+        client.log_api_request(method="GET", endpoint="/test", status_code=200, duration=0.1)
+        client.log_user_action(user_id=999, action="test_action", details={{"test": "data"}})
+        client.log_error(error_type="TestError", error_message="boom", user_id=999)
+        client.flush()
+    """, stub_es, tmp_path)
+
+    assert len(stub_es.documents) == 3
+    assert {doc.get("action") for doc in stub_es.documents} >= {"test_action"}
+
+def test_flush_waits_for_the_batch_held_by_the_flusher_thread(stub_es):
+    from elasticsearch import Elasticsearch
+    from app.elasticsearch.bulk import BulkProcessor
+    from app.elasticsearch.client import OrjsonSerializer
+
+    client = Elasticsearch([f"http://127.0.0.1:{stub_es.server_port}"], serializer=OrjsonSerializer())
+    processor = BulkProcessor(client, flush_interval=1.0)
+    processor.start()
+    try:
+        for i in range(3):
+            processor.add("user-mgt-test", {"i": i})
+        # Give the flusher thread time to take the documents off the queue
+        time.sleep(0.2)
+
+        processor.flush()
+
+        assert sorted(doc["i"] for doc in stub_es.documents) == [0, 1, 2]
+    finally:
+        processor.stop()
+        client.close()
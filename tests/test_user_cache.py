@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+# Point the app at a throwaway database and keep Elasticsearch out of the way
+# before any app module builds its engine or client
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/users.db"
+os.environ["ELASTICSEARCH_ENABLED"] = "false"
+
+import pytest
+from sqlalchemy import update
+from app.database.connection import SessionLocal, init_db
+from app.models.user import User
+from app.schemas.user import UserCreate
+from app.services.user_service import UserService, _user_cache
+
+@pytest.fixture
+def username():
+    init_db()
+    _user_cache.clear()
+    with SessionLocal() as db:
+        user = UserService(db).create_user(
+            UserCreate(username="cached", email="cached@example.com", full_name="Orig")
+        )
+    yield user.username
+    with SessionLocal() as db:
+        db.query(User).delete()
+        db.commit()
+    _user_cache.clear()
+
+def test_cache_hit_keeps_pending_edits(username):
+    with SessionLocal() as db:
+        service = UserService(db)
+        service.get_user_by_username(username)
+        user = service.get_user_by_username(username)
+        user.full_name = "Edited"
+
+        again = service.get_user_by_username(username)
+
+        assert again is user
+        assert again.full_name == "Edited"
+        assert user in db.dirty
+        db.commit()
+
+    with SessionLocal() as db:
+        assert db.get(User, user.id).full_name == "Edited"
+
+def test_cache_hit_does_not_overwrite_fresher_session_state(username):
+    with SessionLocal() as db:
+        UserService(db).get_user_by_username(username)
+
+    # Another writer changes the row without going through the service
+    with SessionLocal() as db:
+        db.execute(update(User).where(User.username == username).values(full_name="Fresh"))
+        db.commit()
+
+    with SessionLocal() as db:
+        loaded = db.query(User).filter(User.username == username).one()
+        assert loaded.full_name == "Fresh"
+
+        user = UserService(db).get_user_by_username(username)
+
+        assert user is loaded
+        assert user.full_name == "Fresh"